@@ -1,8 +1,11 @@
-import os, json, re, hashlib
+import os, json, re, html
 import streamlit as st
 from dotenv import load_dotenv
 from streamlit.components.v1 import html as components_html
 
+from palette import palette_for, sanitize_palette
+from share import AssetStore, encode_schema, from_token, schema_hash as compute_schema_hash, to_token
+
 # ──────────────────────────────
 # Setup
 # ──────────────────────────────
@@ -312,15 +315,7 @@ def local_schema_from_text(text: str, default_schema: dict) -> dict:
     caps = sum(1 for w in re.findall(r"[A-Z]{2,}", text) if len(w) > 2)
     intensity = min(1.0, 0.4 + 0.1 * exclaim + 0.05 * caps)
 
-    PALETTES = {
-        "joy": ["#FFD482", "#F79892", "#F5B3FF"],
-        "nostalgia": ["#F7C6B3", "#EBD8C3", "#C0A5D7"],
-        "calm": ["#B9E3FF", "#DDEBF2", "#BFD6C7"],
-        "love": ["#FFB3C1", "#FFDDE1", "#FFF0F3"],
-        "sad": ["#9DB4C0", "#6C7A89", "#C7D3DD"],
-        "anxiety": ["#A3B1C6", "#D6D6D6", "#8A9DB0"],
-    }
-    palette = PALETTES.get(emotion, default_schema["palette"])
+    palette = palette_for(emotion, intensity)
 
     nodes = 6 if "friend" in t else 4
     for w in ["friends", "family", "group", "team", "all"]:
@@ -353,6 +348,21 @@ def local_schema_from_text(text: str, default_schema: dict) -> dict:
         "summary": summary,
     }
 
+# ──────────────────────────────
+# Schema validation (Gemini output and shared tokens)
+# ──────────────────────────────
+def clean_schema(data: dict, fallback: dict) -> dict:
+    emotion = str(data.get("emotion", fallback["emotion"]))[:40]
+    intensity = round(max(0.0, min(1.0, float(data.get("intensity", fallback["intensity"])))), 2)
+    return {
+        "emotion": emotion,
+        "intensity": intensity,
+        "palette": sanitize_palette(data.get("palette"), emotion, intensity),
+        "nodes": max(3, min(20, int(data.get("nodes", fallback["nodes"])))),
+        "caption": str(data.get("caption", fallback["caption"]))[:64],
+        "summary": str(data.get("summary", "Special day"))[:64],
+    }
+
 # ──────────────────────────────
 # LLM runner (Gemini) with fallback
 # ──────────────────────────────
@@ -372,15 +382,7 @@ def run_llm(text: str):
             i, j = raw.find("{"), raw.rfind("}")
             raw = raw[i:j+1]
         data = json.loads(raw)
-        out = {
-            "emotion": str(data.get("emotion", st.session_state.schema["emotion"]))[:40],
-            "intensity": max(0.0, min(1.0, float(data.get("intensity", st.session_state.schema["intensity"])))),
-            "palette": (data.get("palette", st.session_state.schema["palette"]) or st.session_state.schema["palette"])[:3],
-            "nodes": max(3, min(20, int(data.get("nodes", st.session_state.schema["nodes"])))),
-            "caption": str(data.get("caption", st.session_state.schema["caption"]))[:64],
-            "summary": str(data.get("summary", "Special day"))[:64],
-        }
-        return out
+        return clean_schema(data, st.session_state.schema)
     except Exception:
         # Silent fallback; the UI still works via local generator
         return None
@@ -400,6 +402,20 @@ def update_schema_from_prompt():
         new_schema["caption"] = new_schema["caption"][:64]
     st.session_state.schema = new_schema
 
+# ──────────────────────────────
+# Open a shared doodle (?d=<token>) once per session
+# ──────────────────────────────
+if "shared_token" not in st.session_state:
+    st.session_state.shared_token = st.query_params.get("d", "")
+    if st.session_state.shared_token:
+        try:
+            shared_schema, shared_date = from_token(st.session_state.shared_token)
+            st.session_state.schema = clean_schema(shared_schema, st.session_state.schema)
+            st.session_state.date = shared_date[:64]
+        except ValueError:
+            st.session_state.shared_token = ""
+            st.warning("That share link is invalid; showing the default doodle.")
+
 # ──────────────────────────────
 # UI Layout - Two Columns
 # ──────────────────────────────
@@ -423,6 +439,7 @@ with col1:
         "Date of the memory",
         st.session_state.date,
         key="date_text",
+        max_chars=64,
         on_change=update_schema_from_prompt if st.session_state.auto_mode else None,
     )
 
@@ -439,6 +456,10 @@ with col2:
 schema = st.session_state.schema
 date = st.session_state.date
 
+# Free-text fields may come from Gemini or a shared link: escape before they reach HTML
+safe = {k: html.escape(str(schema[k])) for k in ("emotion", "caption", "summary")}
+safe_date = html.escape(str(date))
+
 # Display metadata in col2
 with col2:
     st.json(schema)
@@ -457,7 +478,7 @@ with col2:
         st.markdown(f"""
         <div class="metadata-card">
             <div class="metadata-label">~ emotion ~</div>
-            <div class="metadata-value">{schema['emotion']}</div>
+            <div class="metadata-value">{safe['emotion']}</div>
         </div>
         """, unsafe_allow_html=True)
         st.markdown(f"""
@@ -484,7 +505,7 @@ with col2:
 
     st.markdown(f"""
     <div class="caption-display">
-        "{date} — {schema['caption']}"
+        "{safe_date} — {safe['caption']}"
     </div>
     """, unsafe_allow_html=True)
 
@@ -494,8 +515,9 @@ with col2:
 st.markdown("---")
 st.markdown("### 🎨 Your Memory Doodle (Paper.js)")
 
-schema_hash = hashlib.md5(json.dumps(schema, sort_keys=True).encode()).hexdigest()
-schema_js = json.dumps(schema, ensure_ascii=True, separators=(",", ":"))
+schema_hash = compute_schema_hash(schema, date)
+schema_js = (json.dumps(schema, ensure_ascii=True, separators=(",", ":"))
+             .replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026"))
 
 paper_html = f"""
 <!DOCTYPE html>
@@ -535,8 +557,8 @@ paper_html = f"""
   <div id="wrap">
     <button id="btnsave" onclick="savePNG()">💾 Download PNG</button>
     <canvas id="paper-canvas" resize width="900" height="900"></canvas>
-    <div id="caption">{date} — {schema['caption']}</div>
-    <div id="summary">{schema['summary']}</div>
+    <div id="caption">{safe_date} — {safe['caption']}</div>
+    <div id="summary">{safe['summary']}</div>
   </div>
 
   <!-- PaperScript -->
@@ -666,10 +688,14 @@ paper_html = f"""
     function savePNG() {{
       var canvas = document.getElementById('paper-canvas');
       if (!canvas) return;
-      const link = document.createElement('a');
-      link.download = 'memory_doodle.png';
-      link.href = canvas.toDataURL('image/png');
-      link.click();
+      canvas.toBlob(function(blob) {{
+        const url = URL.createObjectURL(blob);
+        const link = document.createElement('a');
+        link.download = 'memory_doodle_{schema_hash[:8]}.png';
+        link.href = url;
+        link.click();
+        setTimeout(function() {{ URL.revokeObjectURL(url); }}, 1000);
+      }}, 'image/png');
     }}
   </script>
 </body>
@@ -683,6 +709,36 @@ except Exception as e:
     st.error("⚠️ Failed to render Paper.js canvas.")
     st.exception(e)
 
+# ──────────────────────────────
+# Share + archive (content-addressed by schema_hash)
+# ──────────────────────────────
+# Archiving is opt-in: only the compact payload is kept, the page is rebuilt from it
+DOODLE_STORE_DIR = os.getenv("DOODLE_STORE_DIR", "")
+if DOODLE_STORE_DIR:
+    try:
+        AssetStore(DOODLE_STORE_DIR).put(schema_hash, encode_schema(schema, date))
+    except OSError as e:
+        st.warning(f"Could not archive this doodle. ({e})")
+
+def app_base_url() -> str:
+    base = os.getenv("DOODLE_PUBLIC_URL", "")
+    if base:
+        return base.rstrip("/")
+    try:
+        headers = st.context.headers
+        host = headers.get("Host", "")
+        proto = headers.get("X-Forwarded-Proto", "http")
+    except Exception:
+        host = ""
+    return f"{proto}://{host}" if host else ""
+
+share_base = app_base_url()
+st.markdown("**🔗 Share this doodle**")
+share_token = to_token(schema, date)
+st.code(f"{share_base}/?d={share_token}" if share_base else f"?d={share_token}", language=None)
+if not share_base:
+    st.caption("Append this to the app's address (set DOODLE_PUBLIC_URL to show the full link).")
+
 # Debug
 with st.expander("🔧 Debug Info"):
     st.write("**Chosen model:**", chosen_model)
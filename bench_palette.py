@@ -0,0 +1,51 @@
+"""Batch throughput of the palette engine (correctness lives in test_palette.py).
+
+Usage: python bench_palette.py
+"""
+import timeit
+
+import numpy as np
+
+from palette import (
+    EMOTIONS, check_hex_palettes, check_palettes, fix_palettes, generate_palettes,
+    hex_to_rgb, rgb_to_hex,
+)
+
+N = 5000
+
+
+def _rate(fn, n: int = 50) -> float:
+    """Palettes per millisecond."""
+    fn()
+    return N / (timeit.timeit(fn, number=n) / n * 1e3)
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    ids = rng.integers(0, len(EMOTIONS), N)
+    names = np.array(EMOTIONS)[ids]
+    grid = np.round(rng.random(N), 2)          # schema intensities (2 decimals)
+    free = rng.random(N)                       # arbitrary floats
+    odd = np.array(["wistful", "excited", "bittersweet"])[rng.integers(0, 3, N)]
+    unique = np.array([f"mood {i}" for i in range(N)])
+    rgb = generate_palettes(ids, grid)
+    hexes = rgb_to_hex(rgb)
+    rand = rng.random((N, 3, 3))
+
+    print(f"{'operation':<38} {'palettes/ms':>12}")
+    for label, fn in (
+        ("generate (ids)", lambda: generate_palettes(ids, free)),
+        ("generate (names)", lambda: generate_palettes(names, free)),
+        ("generate (unknown names, cached table)", lambda: generate_palettes(odd, free)),
+        ("generate (all-distinct names, solver)", lambda: generate_palettes(unique, free)),
+        ("check (sRGB floats)", lambda: check_palettes(rgb)),
+        ("check (hex strings)", lambda: check_hex_palettes(hexes)),
+        ("hex → sRGB", lambda: hex_to_rgb(hexes)),
+        ("sRGB → hex", lambda: rgb_to_hex(rgb)),
+        ("fix (random input)", lambda: fix_palettes(rand)),
+    ):
+        print(f"{label:<38} {_rate(fn):>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Size and speed of the compact doodle payload vs. the inline JSON schema
+(correctness lives in test_share.py).
+
+Usage: python bench_payload.py
+"""
+import json
+import timeit
+
+from share import decode_schema, encode_schema, from_token, to_token
+
+SAMPLES = {
+    "local": (
+        {
+            "emotion": "nostalgia",
+            "intensity": 0.8,
+            "palette": ["#F79892", "#FFD482", "#C0A5D7"],
+            "nodes": 10,
+            "caption": "Old friends, new laughter",
+            "summary": "Birthday memories",
+        },
+        "October 25, 2025",
+    ),
+    "gemini": (
+        {
+            "emotion": "bittersweet",
+            "intensity": 0.63,
+            "palette": ["#E8B4A0", "#A7C7E7", "#F2E2BA"],
+            "nodes": 14,
+            "caption": "Sunlight on the porch, grandma's lemonade and the old radio",
+            "summary": "Summer porch",
+        },
+        "July 4, 1998",
+    ),
+}
+
+
+def main(n: int = 20000) -> None:
+    print(f"{'sample':<8} {'json':>6} {'binary':>7} {'token':>6} {'encode µs':>10} {'decode µs':>10} {'token rt µs':>12}")
+    for name, (schema, date) in SAMPLES.items():
+        payload = encode_schema(schema, date)
+        token = to_token(schema, date)
+        raw_json = json.dumps({**schema, "date": date}, ensure_ascii=True, separators=(",", ":"))
+        enc = timeit.timeit(lambda: encode_schema(schema, date), number=n) / n * 1e6
+        dec = timeit.timeit(lambda: decode_schema(payload), number=n) / n * 1e6
+        rt = timeit.timeit(lambda: from_token(to_token(schema, date)), number=n) / n * 1e6
+        print(f"{name:<8} {len(raw_json):>6} {len(payload):>7} {len(token):>6} {enc:>10.2f} {dec:>10.2f} {rt:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
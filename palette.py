@@ -0,0 +1,385 @@
+import functools
+import hashlib
+
+import numpy as np
+
+# ──────────────────────────────
+# Perceptual palette engine (OKLab / OKLCh)
+#
+# Everything below works on arrays of shape (..., 3) so a single palette and
+# a batch of thousands go through the same code path.
+# ──────────────────────────────
+BACKGROUND = "#1a1a1a"
+MIN_CONTRAST = 3.0      # WCAG 2.1 non-text contrast against the canvas
+MIN_DELTA_E = 0.04      # OKLab distance below which two swatches read as "the same"
+LUT_STEPS = 101         # one table row per 0.01 of intensity (the schema's precision)
+
+# Emotion → (lightness, chroma, base hue°, hue offsets° for the 3 swatches)
+EMOTION_PROFILES = {
+    "joy":       (0.86, 0.13,  80.0, (0.0, -55.0, -110.0)),
+    "nostalgia": (0.84, 0.07,  45.0, (0.0,  25.0,  260.0)),
+    "calm":      (0.88, 0.06, 230.0, (0.0,  25.0,  -75.0)),
+    "love":      (0.84, 0.10,   5.0, (0.0,  10.0,   20.0)),
+    "sad":       (0.66, 0.04, 235.0, (0.0,  15.0,   -5.0)),
+    "anxiety":   (0.70, 0.03, 255.0, (0.0,  60.0,  -20.0)),
+}
+EMOTIONS = tuple(EMOTION_PROFILES)
+DEFAULT_PROFILE = EMOTION_PROFILES["nostalgia"]
+
+_M1 = np.array([
+    [0.4122214708, 0.5363325363, 0.0514459929],
+    [0.2119034982, 0.6806995451, 0.1073969566],
+    [0.0883024619, 0.2817188376, 0.6299787005],
+])
+_M2 = np.array([
+    [0.2104542553,  0.7936177850, -0.0040720468],
+    [1.9779984951, -2.4285922050,  0.4505937099],
+    [0.0259040371,  0.7827717662, -0.8086757660],
+])
+_M1_INV = np.linalg.inv(_M1)
+_M2_INV = np.linalg.inv(_M2)
+_LUMA = np.array([0.2126, 0.7152, 0.0722])
+
+
+# ──────────────────────────────
+# Color-space conversions
+# ──────────────────────────────
+def _to_linear(rgb: np.ndarray) -> np.ndarray:
+    return np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+
+
+# sRGB byte → linear light, so 8-bit colors skip the transfer-curve pow()
+_LIN8 = _to_linear(np.arange(256) / 255.0)
+
+
+def _to_gamma(lin: np.ndarray) -> np.ndarray:
+    lin = np.clip(lin, 0.0, 1.0)
+    return np.where(lin <= 0.0031308, lin * 12.92, 1.055 * lin ** (1 / 2.4) - 0.055)
+
+
+def linear_to_oklab(lin: np.ndarray) -> np.ndarray:
+    return np.cbrt(lin @ _M1.T) @ _M2.T
+
+
+def oklab_to_linear(lab: np.ndarray) -> np.ndarray:
+    return ((lab @ _M2_INV.T) ** 3) @ _M1_INV.T
+
+
+def srgb_to_oklab(rgb: np.ndarray) -> np.ndarray:
+    return linear_to_oklab(_to_linear(np.asarray(rgb, dtype=float)))
+
+
+def oklab_to_srgb(lab: np.ndarray) -> np.ndarray:
+    return _to_gamma(oklab_to_linear(lab))
+
+
+def oklch_to_oklab(L, C, h_deg) -> np.ndarray:
+    h = np.radians(h_deg)
+    return np.stack(np.broadcast_arrays(L, C * np.cos(h), C * np.sin(h)), axis=-1)
+
+
+_NIBBLE = np.full(128, 0xFF, dtype=np.uint8)
+for _i, _c in enumerate("0123456789abcdef"):
+    _NIBBLE[ord(_c)] = _NIBBLE[ord(_c.upper())] = _i
+_HEX_DIGITS = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+_NIBBLE_SHIFTS = np.array([20, 16, 12, 8, 4, 0], dtype=np.uint32)
+_SHORT_HEX = [0, 0, 1, 1, 2, 2]
+
+
+def hex_to_bytes(hexes) -> np.ndarray:
+    """Parse '#rrggbb' / '#rgb' strings into (..., 3) uint8 channels without a per-item loop."""
+    arr = np.asarray(hexes, dtype=str)
+    flat = np.char.strip(arr.reshape(-1))
+    if flat.size and flat.dtype.itemsize > 7 * 4:
+        too_long = np.char.str_len(flat) > 7
+        if too_long.any():
+            raise ValueError(f"not a hex color: {str(flat[too_long][0])!r}")
+    # UTF-32 code points, one row per color
+    codes = np.ascontiguousarray(flat.astype("U7")).view(np.uint32).reshape(-1, 7)
+    if (codes[:, 0] == ord("#")).all() and codes[:, 6].all():
+        nib = _NIBBLE[np.minimum(codes[:, 1:], 127)]
+        valid = np.all(nib < 16, axis=1)
+    else:
+        hashed = codes[:, :1] == ord("#")
+        digits = np.where(hashed, np.pad(codes[:, 1:], ((0, 0), (0, 1))), codes)
+        length = np.count_nonzero(digits, axis=1)
+        nib = _NIBBLE[np.minimum(digits, 127)]
+        nib = np.where((length == 6)[:, None], nib[:, :6], nib[:, _SHORT_HEX])
+        valid = ((length == 6) | (length == 3)) & np.all(nib < 16, axis=1)
+    if not valid.all():
+        raise ValueError(f"not a hex color: {str(flat[~valid][0])!r}")
+    return ((nib[:, 0::2] << 4) | nib[:, 1::2]).reshape(arr.shape + (3,))
+
+
+def hex_to_int(hexes) -> np.ndarray:
+    """Parse hex colors into packed 24-bit 0xRRGGBB ints."""
+    c = hex_to_bytes(hexes).astype(np.uint32)
+    return (c[..., 0] << 16) | (c[..., 1] << 8) | c[..., 2]
+
+
+def hex_to_rgb(hexes) -> np.ndarray:
+    """Parse '#rrggbb' / '#rgb' strings into sRGB floats in [0, 1]."""
+    return hex_to_bytes(hexes) / 255.0
+
+
+def rgb_to_int(rgb: np.ndarray) -> np.ndarray:
+    c = np.clip(np.rint(np.asarray(rgb) * 255.0), 0, 255).astype(np.uint32)
+    return (c[..., 0] << 16) | (c[..., 1] << 8) | c[..., 2]
+
+
+def quantize(rgb: np.ndarray) -> np.ndarray:
+    """Snap sRGB floats to the 8-bit grid that '#RRGGBB' can represent."""
+    return np.clip(np.rint(np.asarray(rgb, dtype=float) * 255.0), 0, 255) / 255.0
+
+
+def rgb_to_hex(rgb: np.ndarray):
+    """'#RRGGBB' for each color; a str for one color, a 'U7' array otherwise."""
+    ints = rgb_to_int(rgb)
+    flat = ints.reshape(-1)
+    chars = np.empty((flat.size, 7), dtype=np.uint8)
+    chars[:, 0] = ord("#")
+    chars[:, 1:] = _HEX_DIGITS[(flat[:, None] >> _NIBBLE_SHIFTS) & 0xF]
+    out = chars.view("S7").reshape(ints.shape).astype("U7")
+    return str(out) if out.ndim == 0 else out
+
+
+def is_hex_color(value) -> bool:
+    if not isinstance(value, str):
+        return False
+    try:
+        hex_to_bytes(value)
+    except ValueError:
+        return False
+    return True
+
+
+# Canvas luminance, the reference for every contrast check
+_BG_LUMINANCE = _LIN8[hex_to_bytes(BACKGROUND)] @ _LUMA
+
+
+# ──────────────────────────────
+# Gamut, contrast and dedupe
+# ──────────────────────────────
+def _in_gamut(lab: np.ndarray, eps: float = 1e-4) -> np.ndarray:
+    lin = oklab_to_linear(lab)
+    return np.all((lin >= -eps) & (lin <= 1 + eps), axis=-1)
+
+
+def gamut_map(lab: np.ndarray, iters: int = 12) -> np.ndarray:
+    """Pull out-of-gamut colors toward the neutral axis, keeping L and hue."""
+    lab = np.array(lab, dtype=float)
+    bad = ~_in_gamut(lab)
+    if not bad.any():
+        return lab
+    sub = lab[bad]
+    lo, hi = np.zeros(len(sub)), np.ones(len(sub))
+    for _ in range(iters):
+        mid = (lo + hi) / 2
+        ok = _in_gamut(np.concatenate([sub[:, :1], sub[:, 1:] * mid[:, None]], axis=1))
+        lo, hi = np.where(ok, mid, lo), np.where(ok, hi, mid)
+    sub[:, 1:] *= lo[:, None]
+    lab[bad] = sub
+    return lab
+
+
+def _luminance_lab(lab: np.ndarray) -> np.ndarray:
+    return np.clip(oklab_to_linear(lab), 0.0, 1.0) @ _LUMA
+
+
+def enforce_contrast(lab: np.ndarray, min_ratio: float = MIN_CONTRAST,
+                     iters: int = 14) -> np.ndarray:
+    """Raise OKLab lightness just enough to clear `min_ratio` against the canvas."""
+    lab = np.array(lab, dtype=float)
+    target = min_ratio * (_BG_LUMINANCE + 0.05) - 0.05
+    bad = _luminance_lab(lab) < target
+    if not bad.any():
+        return lab
+    sub = lab[bad]
+    lo, hi = sub[:, 0].copy(), np.ones(len(sub))
+    for _ in range(iters):
+        mid = (lo + hi) / 2
+        ok = _luminance_lab(np.concatenate([mid[:, None], sub[:, 1:]], axis=1)) >= target
+        lo, hi = np.where(ok, lo, mid), np.where(ok, mid, hi)
+    sub[:, 0] = hi
+    lab[bad] = gamut_map(sub)
+    return lab
+
+
+_PAIRS = ((0, 1), (0, 2), (1, 2))
+
+
+def pairwise_delta_e(lab: np.ndarray) -> np.ndarray:
+    """OKLab distances for swatch pairs (0,1), (0,2), (1,2); shape (..., 3)."""
+    return np.stack([np.linalg.norm(lab[..., i, :] - lab[..., j, :], axis=-1)
+                     for i, j in _PAIRS], axis=-1)
+
+
+def dedupe(lab: np.ndarray, min_delta: float = MIN_DELTA_E) -> np.ndarray:
+    """Nudge near-identical swatches apart (lighter, rotated hue)."""
+    lab = np.array(lab, dtype=float)
+    for i, j in _PAIRS:
+        d = np.linalg.norm(lab[..., i, :] - lab[..., j, :], axis=-1)
+        close = d < min_delta
+        if not close.any():
+            continue
+        c = lab[close, j]
+        # Moving up in L keeps the contrast guarantee; near white we step down.
+        step = np.where(c[:, 0] < 0.9, 1.0, -1.0) * min_delta * 1.5
+        cos, sin = np.cos(np.radians(40.0)), np.sin(np.radians(40.0))
+        a, b = c[:, 1] * cos - c[:, 2] * sin, c[:, 1] * sin + c[:, 2] * cos
+        lab[close, j] = gamut_map(np.stack([np.clip(c[:, 0] + step, 0, 1), a, b], axis=-1))
+    return lab
+
+
+# ──────────────────────────────
+# Palette generation / checking (batch)
+# ──────────────────────────────
+def _profile(emotion: str):
+    key = str(emotion).strip().lower()
+    if key in EMOTION_PROFILES:
+        return EMOTION_PROFILES[key]
+    # Unknown emotions (e.g. from Gemini) get a stable hue of their own.
+    L, C, _, offsets = DEFAULT_PROFILE
+    hue = int(hashlib.md5(key.encode()).hexdigest()[:4], 16) % 360
+    return L, C, float(hue), offsets
+
+
+def _profile_row(emotion: str) -> list:
+    L, C, H, offsets = _profile(emotion)
+    return [L, C, H, *offsets]
+
+
+# Row k describes EMOTIONS[k]: L, C, hue, 3 hue offsets
+PROFILE_TABLE = np.array([_profile_row(e) for e in EMOTIONS])
+_EMOTION_IDS = {e: k for k, e in enumerate(EMOTIONS)}
+
+
+def _check_bytes(c8: np.ndarray, min_ratio: float, min_delta: float) -> np.ndarray:
+    lin = _LIN8[c8]
+    # Every swatch is lighter than the canvas, so the ratio test is a luminance floor.
+    floor = (min_ratio - 1e-6) * (_BG_LUMINANCE + 0.05) - 0.05
+    contrast_ok = np.all(lin @ _LUMA >= floor, axis=-1)
+    distinct = np.all(pairwise_delta_e(linear_to_oklab(lin)) >= min_delta - 1e-6, axis=-1)
+    return contrast_ok & distinct
+
+
+def check_palettes(rgb: np.ndarray, min_ratio: float = MIN_CONTRAST,
+                   min_delta: float = MIN_DELTA_E) -> np.ndarray:
+    """True for each (3, 3) palette that clears contrast and has distinct swatches.
+
+    Colors are judged as they will be written out, i.e. snapped to '#RRGGBB'.
+    """
+    c8 = np.clip(np.rint(np.asarray(rgb, dtype=float) * 255.0), 0, 255).astype(np.intp)
+    return _check_bytes(c8, min_ratio, min_delta)
+
+
+def check_hex_palettes(hexes, min_ratio: float = MIN_CONTRAST,
+                       min_delta: float = MIN_DELTA_E) -> np.ndarray:
+    """`check_palettes` for (N, 3) arrays of hex strings."""
+    return _check_bytes(hex_to_bytes(hexes), min_ratio, min_delta)
+
+
+def _repair(rgb: np.ndarray, margin: float) -> np.ndarray:
+    lab = srgb_to_oklab(rgb)
+    shape = lab.shape
+    lab = enforce_contrast(gamut_map(lab.reshape(-1, 3)), MIN_CONTRAST * (1 + 0.02 * margin))
+    lab = dedupe(lab.reshape(shape), MIN_DELTA_E * (1 + 0.15 * margin))
+    return quantize(oklab_to_srgb(lab))
+
+
+def fix_palettes(rgb: np.ndarray, rounds: int = 4) -> np.ndarray:
+    """Enforce canvas contrast and swatch separation on (N, 3, 3) sRGB palettes.
+
+    Output is snapped to the 8-bit grid and re-checked there, so what passes
+    `check_palettes` here still passes once written out as hex. Palettes that
+    already pass are only quantized; failing ones are repaired with a growing
+    safety margin. A pathological input can still fail after `rounds`, so
+    callers that need the guarantee should re-check (see `sanitize_palette`).
+    """
+    rgb = quantize(rgb)
+    todo = ~check_palettes(rgb)
+    for k in range(1, rounds + 1):
+        if not todo.any():
+            break
+        rgb[todo] = _repair(rgb[todo], k)
+        todo[todo] = ~check_palettes(rgb[todo])
+    return rgb
+
+
+def _compute_palettes(rows: np.ndarray, t: np.ndarray) -> np.ndarray:
+    L, C, H, offs = rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3:]
+    # Intensity saturates the palette and widens the hue spread.
+    chroma = C * (0.55 + 0.9 * t)
+    spread = 0.6 + 0.8 * t
+    light = L - 0.06 * t
+    hues = H[:, None] + offs * spread[:, None]
+    lightness = light[:, None] + np.array([0.0, 0.04, -0.04])
+    lab = oklch_to_oklab(lightness, chroma[:, None] * np.array([1.0, 0.8, 0.9]), hues)
+    return fix_palettes(oklab_to_srgb(gamut_map(lab.reshape(-1, 3)).reshape(-1, 3, 3)))
+
+
+def _build_table() -> np.ndarray:
+    levels = np.linspace(0.0, 1.0, LUT_STEPS)
+    rows = np.repeat(PROFILE_TABLE, LUT_STEPS, axis=0)
+    rgb = _compute_palettes(rows, np.tile(levels, len(EMOTIONS)))
+    return rgb.reshape(len(EMOTIONS), LUT_STEPS, 3, 3)
+
+
+# (emotion id, intensity step, swatch, channel), 8-bit-exact sRGB
+PALETTE_TABLE = _build_table()
+PALETTE_LUT = dict(zip(EMOTIONS, rgb_to_hex(PALETTE_TABLE).tolist()))
+
+
+@functools.lru_cache(maxsize=256)
+def _extra_table(key: str) -> np.ndarray:
+    """PALETTE_TABLE-style rows for an emotion outside EMOTION_PROFILES."""
+    rows = np.repeat(np.array([_profile_row(key)]), LUT_STEPS, axis=0)
+    return _compute_palettes(rows, np.linspace(0.0, 1.0, LUT_STEPS))
+
+
+def generate_palettes(emotions, intensities) -> np.ndarray:
+    """Harmonious 3-swatch palettes for parallel arrays of emotions/intensities.
+
+    `emotions` may be names or integer ids into EMOTIONS. Intensity is taken
+    at the schema's 0.01 precision, so every palette is a gather from a
+    precomputed table; unknown emotions get their table built on first use
+    (or are computed directly when a batch has too many distinct ones for
+    that to pay off). Returns sRGB floats of shape (N, 3, 3) on the 8-bit grid.
+    """
+    arr = np.asarray(emotions).reshape(-1)
+    t = np.clip(np.asarray(intensities, dtype=float).reshape(-1), 0.0, 1.0)
+    step = np.rint(t * (LUT_STEPS - 1)).astype(np.intp)
+    if np.issubdtype(arr.dtype, np.integer):
+        return PALETTE_TABLE[arr, step]
+
+    names, inverse = np.unique(arr.astype(str), return_inverse=True)
+    keys = [str(n).strip().lower() for n in names]
+    unknown = [k for k in keys if k not in _EMOTION_IDS]
+    if len(unknown) * LUT_STEPS > len(arr):
+        rows = np.array([_profile_row(k) for k in keys])[inverse]
+        return _compute_palettes(rows, step / (LUT_STEPS - 1))
+    tables = np.stack([PALETTE_TABLE[_EMOTION_IDS[k]] if k in _EMOTION_IDS else _extra_table(k)
+                       for k in keys])
+    return tables[inverse, step]
+
+
+# ──────────────────────────────
+# Single-palette helpers used by the app
+# ──────────────────────────────
+def palette_for(emotion: str, intensity: float) -> list:
+    return rgb_to_hex(generate_palettes([str(emotion)], [float(intensity)])[0]).tolist()
+
+
+def sanitize_palette(palette, emotion: str, intensity: float) -> list:
+    """Validate an external (e.g. LLM) palette; repair it or fall back to the engine."""
+    fallback = palette_for(emotion, intensity)
+    if not isinstance(palette, (list, tuple)):
+        return fallback
+    hexes = [p.strip() for p in palette if is_hex_color(p)][:3]
+    hexes += fallback[len(hexes):]
+    rgb = hex_to_rgb(hexes)[None]
+    if not check_palettes(rgb)[0]:
+        rgb = fix_palettes(rgb)
+        if not check_palettes(rgb)[0]:
+            return fallback
+    return rgb_to_hex(rgb[0]).tolist()
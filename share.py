@@ -0,0 +1,259 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import struct
+import tempfile
+import zlib
+
+from palette import hex_to_int
+
+# ──────────────────────────────
+# Compact binary doodle payload
+#
+#   byte 0  B             version | flags
+#   header  3×3s B B      palette (3 × 24-bit RGB), intensity, nodes
+#   refs    4 × B         emotion, caption, summary, date → string ids
+#   strings varint count, then (varint len, utf-8 bytes)*
+#
+# String ids below len(STATIC_STRINGS) point at the shared table, the rest at
+# the payload's own (deduplicated) table. If deflate makes the body smaller
+# the FLAG_DEFLATE bit is set and everything after the first byte is raw
+# deflate.
+# ──────────────────────────────
+VERSION = 1
+FLAG_DEFLATE = 0x80
+INTENSITY_STEPS = 100   # schema intensity is kept to 2 decimals
+MIN_NODES, MAX_NODES = 3, 20
+# Character limits, matching what run_llm() lets through
+MAX_CHARS = {"emotion": 40, "caption": 64, "summary": 64, "date": 64}
+MAX_BODY = 1024         # decoded body cap; real payloads are well under 300 bytes
+
+# Append-only: ids are baked into issued tokens. Deliberately spelled out
+# rather than taken from palette.EMOTIONS so profile changes can't shift ids.
+STATIC_STRINGS = (
+    "joy",
+    "nostalgia",
+    "calm",
+    "love",
+    "sad",
+    "anxiety",
+    "",
+    "A day to remember",
+    "Old friends, new laughter",
+    "A day that glowed",
+    "Back to where we began",
+    "Special day",
+    "Birthday memories",
+    "Friend reunion",
+    "Nostalgic moments",
+)
+_STATIC_IDS = {s: i for i, s in enumerate(STATIC_STRINGS)}
+_HEADER = struct.Struct(">3s3s3sBB4B")
+_STRING_FIELDS = ("emotion", "caption", "summary")
+_KEY_RE = re.compile(r"[0-9a-f]{32}")
+
+
+def _write_varint(out: bytearray, n: int) -> None:
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(buf: bytes, pos: int):
+    n = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _color_bytes(hex_color: str) -> bytes:
+    return int(hex_color.lstrip("#"), 16).to_bytes(3, "big")
+
+
+def canonical_schema(schema: dict) -> dict:
+    """The schema exactly as it survives a payload round-trip.
+
+    Raises ValueError for palettes that aren't three '#rgb'/'#rrggbb' colors.
+    """
+    palette = list(schema["palette"])
+    if len(palette) != 3 or not all(isinstance(c, str) for c in palette):
+        raise ValueError("palette must be exactly 3 hex color strings")
+    return {
+        "emotion": str(schema["emotion"])[:MAX_CHARS["emotion"]],
+        "intensity": round(min(1.0, max(0.0, float(schema["intensity"]))), 2),
+        "palette": ["#%06X" % c for c in hex_to_int(palette).tolist()],
+        "nodes": max(MIN_NODES, min(MAX_NODES, int(schema["nodes"]))),
+        "caption": str(schema["caption"])[:MAX_CHARS["caption"]],
+        "summary": str(schema["summary"])[:MAX_CHARS["summary"]],
+    }
+
+
+def canonical_date(date) -> str:
+    return str(date)[:MAX_CHARS["date"]]
+
+
+def encode_schema(schema: dict, date: str = "") -> bytes:
+    s = canonical_schema(schema)
+    table, local = [], {}
+
+    def ref(text: str) -> int:
+        if text in _STATIC_IDS:
+            return _STATIC_IDS[text]
+        if text not in local:
+            local[text] = len(STATIC_STRINGS) + len(table)
+            table.append(text)
+        return local[text]
+
+    refs = [ref(s[f]) for f in _STRING_FIELDS] + [ref(canonical_date(date))]
+    if max(refs) > 0xFF:
+        raise ValueError("string table overflow")
+
+    body = bytearray(_HEADER.pack(
+        *(_color_bytes(c) for c in s["palette"]),
+        round(s["intensity"] * INTENSITY_STEPS), s["nodes"], *refs,
+    ))
+    _write_varint(body, len(table))
+    for text in table:
+        raw = text.encode("utf-8")
+        _write_varint(body, len(raw))
+        body += raw
+
+    packed = zlib.compress(bytes(body), 9)[2:-4]  # raw deflate, no zlib framing
+    if len(packed) < len(body):
+        return bytes([VERSION | FLAG_DEFLATE]) + packed
+    return bytes([VERSION]) + bytes(body)
+
+
+def _inflate(body: bytes) -> bytes:
+    d = zlib.decompressobj(-15)
+    try:
+        out = d.decompress(body, MAX_BODY)
+    except zlib.error as e:
+        raise ValueError(f"malformed payload ({e})") from None
+    if d.unconsumed_tail or not d.eof:
+        raise ValueError("payload body too large or truncated")
+    if d.unused_data:
+        raise ValueError("trailing bytes after deflate stream")
+    # encode_schema only deflates when that makes the body smaller
+    if len(out) <= len(body):
+        raise ValueError("deflated body is not smaller than its raw form")
+    return out
+
+
+def decode_schema(payload: bytes):
+    """Inverse of `encode_schema`; returns (schema, date).
+
+    Untrusted input: anything `encode_schema` couldn't have produced raises
+    ValueError (callers still escape the strings before rendering them).
+    """
+    if not payload:
+        raise ValueError("empty payload")
+    head, body = payload[0], payload[1:]
+    if head & ~FLAG_DEFLATE != VERSION:
+        raise ValueError(f"unsupported payload version {head & ~FLAG_DEFLATE}")
+    if head & FLAG_DEFLATE:
+        body = _inflate(body)
+    if len(body) > MAX_BODY:
+        raise ValueError("payload body too large")
+
+    try:
+        c0, c1, c2, intensity, nodes, *refs = _HEADER.unpack_from(body)
+        count, pos = _read_varint(body, _HEADER.size)
+        table = list(STATIC_STRINGS)
+        for _ in range(count):
+            n, pos = _read_varint(body, pos)
+            if pos + n > len(body):
+                raise ValueError("truncated string table")
+            table.append(body[pos:pos + n].decode("utf-8"))
+            pos += n
+        emotion, caption, summary, date = (table[r] for r in refs)
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"malformed payload ({e})") from None
+    if pos != len(body):
+        raise ValueError("trailing bytes in payload")
+    if intensity > INTENSITY_STEPS:
+        raise ValueError(f"intensity out of range: {intensity}")
+    if not MIN_NODES <= nodes <= MAX_NODES:
+        raise ValueError(f"nodes out of range: {nodes}")
+    for field, text in zip(_STRING_FIELDS + ("date",), (emotion, caption, summary, date)):
+        if len(text) > MAX_CHARS[field]:
+            raise ValueError(f"{field} longer than {MAX_CHARS[field]} characters")
+
+    schema = {
+        "emotion": emotion,
+        "intensity": round(intensity / INTENSITY_STEPS, 2),
+        "palette": ["#" + c.hex().upper() for c in (c0, c1, c2)],
+        "nodes": nodes,
+        "caption": caption,
+        "summary": summary,
+    }
+    return schema, date
+
+
+def to_token(schema: dict, date: str = "") -> str:
+    return base64.urlsafe_b64encode(encode_schema(schema, date)).rstrip(b"=").decode("ascii")
+
+
+def from_token(token: str):
+    token = token.strip()
+    try:
+        payload = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (ValueError, TypeError) as e:  # binascii.Error is a ValueError
+        raise ValueError(f"malformed token ({e})") from None
+    return decode_schema(payload)
+
+
+def schema_hash(schema: dict, date: str = "") -> str:
+    """Store key; computed on the canonical form so equal doodles share a key."""
+    doc = {**canonical_schema(schema), "date": canonical_date(date)}
+    return hashlib.md5(json.dumps(doc, sort_keys=True).encode()).hexdigest()
+
+
+# ──────────────────────────────
+# Content-addressed asset store
+# ──────────────────────────────
+class AssetStore:
+    """One directory per hash prefix; each doodle's payload is written once.
+
+    Only the compact payload is kept: it decodes to the identical schema and
+    date, from which the page is rebuilt.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str, ext: str) -> str:
+        if not isinstance(key, str) or not _KEY_RE.fullmatch(key):
+            raise ValueError(f"not a schema hash: {key!r}")
+        return os.path.join(self.root, key[:2], f"{key}{ext}")
+
+    def _write_once(self, path: str, data: bytes) -> bool:
+        if os.path.exists(path):
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return True
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self._path(key, ".bin"))
+
+    def put(self, key: str, payload: bytes) -> bool:
+        """Store a payload under `key`; returns False if it was already there."""
+        return self._write_once(self._path(key, ".bin"), payload)
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key, ".bin"), "rb") as f:
+                return decode_schema(f.read())
+        except FileNotFoundError:
+            return None
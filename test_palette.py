@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from palette import (
+    BACKGROUND, EMOTIONS, MIN_CONTRAST, PALETTE_LUT, check_hex_palettes, check_palettes,
+    fix_palettes, generate_palettes, hex_to_int, hex_to_rgb, is_hex_color, palette_for,
+    rgb_to_hex, sanitize_palette,
+)
+
+N = 2000
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+def test_hex_round_trip(rng):
+    rgb = rng.integers(0, 256, (N, 3)) / 255.0
+    hexes = rgb_to_hex(rgb)
+    assert (hex_to_rgb(hexes) == rgb).all()
+    assert rgb_to_hex(np.array([1.0, 0.0, 0.5])) == "#FF0080"
+
+
+def test_hex_parsing_forms():
+    assert hex_to_int(["#ABCDEF", "abcdef", " #123 ", "#fff"]).tolist() == [
+        0xABCDEF, 0xABCDEF, 0x112233, 0xFFFFFF,
+    ]
+
+
+@pytest.mark.parametrize("bad", ["#ab", "#abcd", "#abcdeg", "#12345678", "", "#12 456", "#ａｂｃ"])
+def test_hex_parsing_rejects(bad):
+    with pytest.raises(ValueError):
+        hex_to_int([bad])
+    assert not is_hex_color(bad)
+
+
+def test_lookup_table_passes_checks():
+    for rows in PALETTE_LUT.values():
+        assert check_hex_palettes(rows).all()
+
+
+@pytest.mark.parametrize("emotions", [
+    "known", "unknown", "distinct",
+])
+def test_generated_hex_palettes_pass_checks(rng, emotions):
+    names = {
+        "known": np.array(EMOTIONS)[rng.integers(0, len(EMOTIONS), N)],
+        "unknown": np.array(["wistful", "excited", "bittersweet"])[rng.integers(0, 3, N)],
+        "distinct": np.array([f"mood {i}" for i in range(N)]),
+    }[emotions]
+    rgb = generate_palettes(names, rng.random(N))
+    assert check_hex_palettes(rgb_to_hex(rgb)).all()
+
+
+def test_generate_by_id_matches_by_name(rng):
+    ids = rng.integers(0, len(EMOTIONS), 50)
+    t = np.round(rng.random(50), 2)
+    assert (generate_palettes(ids, t) == generate_palettes(np.array(EMOTIONS)[ids], t)).all()
+
+
+def test_fix_palettes_random_input(rng):
+    rand = rng.random((N, 3, 3))
+    rand[: N // 2, 1] = np.clip(rand[: N // 2, 0] + 0.003, 0, 1)   # near-duplicate swatches
+    assert check_hex_palettes(rgb_to_hex(fix_palettes(rand))).all()
+
+
+def test_check_rejects_low_contrast_and_duplicates():
+    assert not check_hex_palettes([[BACKGROUND, "#FFFFFF", "#FFD482"]])[0]
+    assert not check_hex_palettes([["#FFD482", "#FFD482", "#FFFFFF"]])[0]
+    assert check_palettes(hex_to_rgb([["#F79892", "#FFD482", "#C0A5D7"]]), MIN_CONTRAST)[0]
+
+
+@pytest.mark.parametrize("bad", [
+    ["#1a1a1a"] * 3, ["#000", "#111", "#222"], ["#fff"] * 3, ["nope"], "nope", None,
+])
+def test_sanitize_palette_always_passes(bad):
+    out = sanitize_palette(bad, "sad", 0.5)
+    assert len(out) == 3 and check_hex_palettes([out])[0]
+
+
+def test_sanitize_keeps_good_palette():
+    good = ["#F79892", "#FFD482", "#C0A5D7"]
+    assert sanitize_palette([c.lower() for c in good], "joy", 0.5) == good
+
+
+def test_palette_for_returns_plain_strings():
+    out = palette_for("Excitement", 0.7)
+    assert all(type(c) is str for c in out)
@@ -0,0 +1,119 @@
+import base64
+import struct
+import zlib
+
+import pytest
+
+from share import (
+    FLAG_DEFLATE, VERSION, AssetStore, canonical_schema, decode_schema, encode_schema,
+    from_token, schema_hash, to_token,
+)
+
+SCHEMA = {
+    "emotion": "nostalgia",
+    "intensity": 0.8,
+    "palette": ["#F79892", "#FFD482", "#C0A5D7"],
+    "nodes": 10,
+    "caption": "Old friends, new laughter",
+    "summary": "Birthday memories",
+}
+DATE = "October 25, 2025"
+CUSTOM = {
+    **SCHEMA,
+    "emotion": "wistful ✨",
+    "caption": "Sunlight on the porch, grandma's lemonade and the old radio",
+    "summary": "Summer porch",
+}
+
+
+def _token(head: int, body: bytes) -> str:
+    return base64.urlsafe_b64encode(bytes([head]) + body).rstrip(b"=").decode("ascii")
+
+
+def _body(nodes: int = 10, refs=(1, 7, 11, 6), strings=()) -> bytes:
+    body = struct.pack(">3s3s3sBB4B", b"\xf7\x98\x92", b"\xff\xd4\x82", b"\xc0\xa5\xd7", 80, nodes, *refs)
+    body += bytes([len(strings)])
+    for text in strings:
+        raw = text.encode("utf-8")
+        body += bytes([len(raw)]) + raw
+    return body
+
+
+def _deflate(data: bytes) -> bytes:
+    c = zlib.compressobj(9, zlib.DEFLATED, -15)
+    return c.compress(data) + c.flush()
+
+
+@pytest.mark.parametrize("schema,date", [(SCHEMA, DATE), (SCHEMA, ""), (CUSTOM, "July 4, 1998")])
+def test_round_trip(schema, date):
+    assert decode_schema(encode_schema(schema, date)) == (schema, date)
+    assert from_token(to_token(schema, date)) == (schema, date)
+
+
+def test_custom_strings_are_deflated_and_deduplicated():
+    dup = {**CUSTOM, "summary": CUSTOM["caption"]}
+    payload = encode_schema(dup, "x")
+    assert payload[0] & FLAG_DEFLATE
+    assert len(payload) < len(encode_schema(CUSTOM, "x"))
+    assert decode_schema(payload) == (dup, "x")
+
+
+def test_non_canonical_schema_round_trips_to_canonical_form():
+    messy = {**SCHEMA, "intensity": 0.45000000000000007, "palette": ["#f79892", "#abc", " ffd482"]}
+    clean = canonical_schema(messy)
+    assert clean["intensity"] == 0.45
+    assert clean["palette"] == ["#F79892", "#AABBCC", "#FFD482"]
+    assert from_token(to_token(messy, DATE)) == (clean, DATE)
+    assert schema_hash(messy, DATE) == schema_hash(clean, DATE)
+
+
+@pytest.mark.parametrize("palette", [
+    ["#abcd", "#000", "#fff"], ["#000", "#fff"], [0x123456, "#000", "#fff"], [123, "#000", "#fff"],
+])
+def test_bad_palette_rejected(palette):
+    with pytest.raises(ValueError):
+        encode_schema({**SCHEMA, "palette": palette}, DATE)
+
+
+_VALID_DEFLATED = encode_schema(CUSTOM, "x")
+_BOMB = _deflate(_body(strings=("x" * 60,)) + b"\0" * 1_000_000)
+
+MALFORMED = {
+    "not base64": "@@@",
+    "empty": "",
+    "unknown version": _token(VERSION + 1, _body()),
+    "truncated": _token(VERSION, _body()[:8]),
+    "nodes out of range": _token(VERSION, _body(nodes=200)),
+    "dangling string ref": _token(VERSION, _body(refs=(1, 200, 11, 6))),
+    "oversized caption": _token(VERSION, _body(refs=(1, 15, 11, 6), strings=("x" * 65,))),
+    "trailing bytes": _token(VERSION, _body() + b"\0"),
+    "deflate bomb": _token(VERSION | FLAG_DEFLATE, _BOMB),
+    "bad deflate": _token(VERSION | FLAG_DEFLATE, b"\xff\xff"),
+    "junk after deflate stream": _token(_VALID_DEFLATED[0], _VALID_DEFLATED[1:] + b"garbage"),
+    "deflate that doesn't shrink": _token(VERSION | FLAG_DEFLATE, _deflate(_body())),
+}
+
+
+@pytest.mark.parametrize("token", MALFORMED.values(), ids=MALFORMED.keys())
+def test_malformed_token_rejected(token):
+    with pytest.raises(ValueError):
+        from_token(token)
+
+
+def test_store_keeps_one_copy(tmp_path):
+    store = AssetStore(str(tmp_path))
+    key = schema_hash(SCHEMA, DATE)
+    assert not store.has(key)
+    assert store.put(key, encode_schema(SCHEMA, DATE))
+    same = {**SCHEMA, "intensity": 0.8000000000000001, "palette": [c.lower() for c in SCHEMA["palette"]]}
+    assert schema_hash(same, DATE) == key
+    assert not store.put(key, encode_schema(same, DATE))
+    assert store.get(key) == (SCHEMA, DATE)
+    assert len(list(tmp_path.rglob("*.bin"))) == 1
+    assert store.get("0" * 32) is None
+
+
+@pytest.mark.parametrize("key", ["../../etc/passwd", "A" * 32, "0" * 31, None])
+def test_store_rejects_non_hash_keys(tmp_path, key):
+    with pytest.raises(ValueError):
+        AssetStore(str(tmp_path)).put(key, b"")